@@ -18,26 +18,36 @@ Compatibility notes:
 - Errors are typically negative (e.g. resp -101).
 """
 
+import functools
 import json
 import os
+import queue
+import select
 import socket
 import sys
 import time
-import queue
+import struct
 import threading
 import subprocess
 import signal
+from concurrent.futures import Future
 from pathlib import Path
 from typing import Any, Optional
 
 import jack
-import mido
+
+try:
+    import orjson as _json
+except ImportError:  # stdlib fallback; json.loads accepts bytes too
+    _json = json
 
 # ---- Configuration ----
 
 MOD_HOST = os.environ.get("MOD_HOST", "127.0.0.1")
 MOD_PORT = int(os.environ.get("MOD_PORT", "5555"))
 TIMEOUT_S = float(os.environ.get("MOD_TIMEOUT", "5.0"))
+MAX_BATCH_BYTES = 64 * 1024  # Upper bound for one pipelined write to mod-host
+SOCK_BUF_BYTES = 256 * 1024  # SO_SNDBUF / SO_RCVBUF for the mod-host socket
 COMMON_CHANNEL = 2  # User confirmed Channel 2
 KILL_PC = 50 # set this to a PC to force a shutdown
 
@@ -48,13 +58,47 @@ STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
 # Which JACK MIDI source to tap for Program Changes
 TARGET_PORT = "system:midi_capture_1"
 FILTER_CHANNEL = None  # Set to 0-15 to filter by channel, or None for all
+DEBUG = False  # Decode and print every Program Change received
+
+# Plugins switched by Program Change
+PIANO_URIS = frozenset({
+    "http://sfztools.github.io/sfizz",
+    "https://github.com/brummer10/Fluida.lv2",
+})
 
 
 stop_event = threading.Event()
 
+# Wakes the main loop: written by the JACK callback after queueing input
+# and by request_stop(). An eventfd where available (Linux, Python 3.10+),
+# else a non-blocking self-pipe; both are written and read the same way.
+if hasattr(os, "eventfd"):
+    _wake_r = _wake_w = os.eventfd(0, os.EFD_NONBLOCK)
+else:
+    _wake_r, _wake_w = os.pipe()
+    os.set_blocking(_wake_r, False)
+    os.set_blocking(_wake_w, False)
+_WAKE = (1).to_bytes(8, sys.byteorder)  # one eventfd increment
+
+def wake() -> None:
+    """Wake the main loop. Never blocks: if full, a wakeup is pending."""
+    try:
+        os.write(_wake_w, _WAKE)
+    except BlockingIOError:
+        pass
+
+def wait_for_wake() -> None:
+    """Sleep until wake() has been called, then reset the wakeup."""
+    select.select([_wake_r], [], [])
+    try:
+        os.read(_wake_r, 4096)
+    except BlockingIOError:
+        pass
+
 def request_stop(signum, frame):
     print(f"\nReceived signal {signum}, stopping...")
     stop_event.set()
+    wake()
 
 signal.signal(signal.SIGTERM, request_stop)
 signal.signal(signal.SIGINT, request_stop)   # Ctrl-C too
@@ -62,106 +106,240 @@ signal.signal(signal.SIGINT, request_stop)   # Ctrl-C too
 
 # ---- Helper Functions ----
 
-def send_cmd(line: str) -> str:
+_conn: Optional[socket.socket] = None
+_reader = None  # buffered reader over _conn, keeps any bytes past a reply
+# Only the mod-host I/O thread touches _conn/_reader; everyone else queues
+# (data, count, future) requests for it.
+_io_q: "queue.SimpleQueue[tuple[bytes, int, Future]]" = queue.SimpleQueue()
+
+
+def _get_conn() -> socket.socket:
+    """
+    Return the long-lived mod-host socket, connecting on first use.
     """
-    Send one mod-host command, return response text (NUL bytes removed).
+    global _conn, _reader
+    if _conn is None:
+        _conn = socket.create_connection((MOD_HOST, MOD_PORT), timeout=TIMEOUT_S)
+        _conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Room for a whole pipelined batch and its replies
+        _conn.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCK_BUF_BYTES)
+        _conn.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCK_BUF_BYTES)
+        _quickack(_conn)
+        _reader = _conn.makefile("rb")
+    return _conn
+
+
+def _quickack(sock: socket.socket) -> None:
     """
-    data = (line.rstrip("\n") + "\n").encode("utf-8", errors="replace")
-    with socket.create_connection((MOD_HOST, MOD_PORT), timeout=TIMEOUT_S) as s:
-        s.sendall(data)
-        s.shutdown(socket.SHUT_WR)
-        resp = b""
-        while True:
-            chunk = s.recv(4096)
-            if not chunk:
-                break
-            resp += chunk
+    Ask for immediate ACKs (Linux). The kernel drops back to delayed ACKs
+    on its own, so this is re-armed before every batch of replies.
+    """
+    if hasattr(socket, "TCP_QUICKACK"):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
 
-    # mod-host may include NUL bytes (you saw this in bash as "ignored null byte")
-    resp = resp.replace(b"\x00", b"")
-    return resp.decode("utf-8", errors="replace").strip()
+
+def _close_conn() -> None:
+    global _conn, _reader
+    try:
+        if _reader is not None:
+            _reader.close()
+        if _conn is not None:
+            _conn.close()
+    except OSError:
+        pass
+    _conn = None
+    _reader = None
 
 
-def parse_resp(resp: str) -> Optional[int]:
+def _read_reply() -> bytes:
     """
-    Parse 'resp <int>' and return the int, else None.
+    Read one reply from mod-host. Replies are terminated by a NUL byte,
+    which is stripped.
     """
-    r = resp.strip().replace("\x00", "")
-    if not r.startswith("resp "):
-        return None
-    parts = r.split()
-    if len(parts) < 2:
-        return None
+    buf = bytearray()
+    while True:
+        chunk = _reader.peek()
+        if not chunk:
+            raise ConnectionError("mod-host closed the connection")
+        end = chunk.find(b"\x00")
+        if end >= 0:
+            buf += _reader.read(end + 1)
+            del buf[-1]
+            return bytes(buf)
+        buf += _reader.read(len(chunk))
+
+
+def send_cmd(line: str) -> bytes:
+    """
+    Send one mod-host command over the shared connection, return the raw
+    response (NUL terminator removed).
+    """
+    return send_cmds([line])[0]
+
+
+class SendError(Exception):
+    """
+    A pipelined send failed part-way. `resps` holds the replies read
+    before the failure, in command order, so callers can still account
+    for the commands mod-host did carry out.
+    """
+
+    def __init__(self, cause: Exception, resps: list[bytes]):
+        super().__init__(str(cause))
+        self.resps = resps
+
+
+def send_cmds(lines: list[str]) -> list[bytes]:
+    """
+    Pipeline several mod-host commands: write them all back-to-back, then
+    read one NUL-terminated reply per command. Raw replies are returned
+    in command order; on failure SendError carries the ones read so far.
+
+    Each batch is joined and encoded in one go. Batches are capped at
+    about MAX_BATCH_BYTES so a huge pedalboard can't fill both socket
+    buffers (us still writing, mod-host blocked on its replies).
+    """
+    resps: list[bytes] = []
+    batch: list[str] = []
+    size = 0
+    for line in lines:
+        line = line.rstrip("\n")
+        if batch and size + len(line) + 1 > MAX_BATCH_BYTES:
+            _send_batch(batch, resps)
+            batch = []
+            size = 0
+        batch.append(line)
+        size += len(line) + 1
+    if batch:
+        _send_batch(batch, resps)
+    return resps
+
+
+def _send_batch(lines: list[str], resps: list[bytes]) -> None:
+    """Send one batch and append its replies to `resps`."""
+    payload = ("\n".join(lines) + "\n").encode("utf-8", errors="replace")
     try:
-        return int(parts[1])
-    except ValueError:
-        return None
+        resps += send_raw(payload, len(lines))
+    except SendError as e:
+        e.resps = resps + e.resps
+        raise
 
 
-def expect_nonnegative(resp: str, what: str) -> int:
+def send_raw(data: bytes, count: int) -> list[bytes]:
     """
-    Accept any non-negative resp code as success; return code.
+    Write pre-encoded, newline-terminated commands as-is and return
+    `count` raw replies. Used by hot paths that cache their command
+    bytes.
     """
-    code = parse_resp(resp)
-    if code is None:
-        raise RuntimeError(f"{what} failed (unparseable): {resp}")
-    if code < 0:
-        raise RuntimeError(f"{what} failed: {resp}")
-    return code
+    return send_raw_async(data, count).result()
 
 
-def expect_zero(resp: str, what: str) -> None:
+def send_raw_async(data: bytes, count: int) -> Future:
     """
-    Success iff resp == 0.
+    Queue pre-encoded commands for the mod-host I/O thread and return a
+    Future for their raw replies, so the caller can keep working during
+    the round trip. Batches are sent in the order they are queued.
     """
-    code = parse_resp(resp)
-    if code != 0:
-        raise RuntimeError(f"{what} failed: {resp}")
+    fut: Future = Future()
+    if not count:
+        fut.set_result([])
+        return fut
+    _io_q.put((data, count, fut))
+    return fut
 
 
-def mod_preload(uri: str, instance_id: int) -> None:
-    resp = send_cmd(f'preload "{uri}" {instance_id}')
-    code = expect_nonnegative(resp, f'add {instance_id} {uri}')
-    # Many builds return the created instance id.
-    if code != instance_id:
-        print(f"WARNING: add requested id={instance_id} but host returned resp {code}")
+def _modhost_io() -> None:
+    """
+    mod-host I/O thread: send each queued batch and read its replies.
 
+    Never waits forever: every read is bounded by the socket timeout, so
+    each Future gets a result or an exception.
+    """
+    while True:
+        data, count, fut = _io_q.get()
+        try:
+            fut.set_result(_exchange(data, count))
+        except Exception as e:
+            fut.set_exception(e)
 
-def mod_bypass(inst: int, bypass_on: bool) -> None:
-    # bypass_on=True  -> "bypass <inst> 1"
-    # bypass_on=False -> "bypass <inst> 0"
-    resp = send_cmd(f"bypass {inst} {1 if bypass_on else 0}")
-    expect_zero(resp, f"bypass {inst}")
 
-def mod_add(uri: str, instance_id: int) -> None:
-    resp = send_cmd(f'add "{uri}" {instance_id}')
-    code = expect_nonnegative(resp, f'add {instance_id} {uri}')
-    # Many builds return the created instance id.
-    if code != instance_id:
-        print(f"WARNING: add requested id={instance_id} but host returned resp {code}")
+def _exchange(data: bytes, count: int) -> list[bytes]:
+    """
+    A dropped connection is re-opened and the batch retried once, unless
+    some replies were already read (retrying would repeat those commands).
+    A timeout is not retried: a late reply would be mistaken for the
+    answer to the next command, so the connection is discarded instead.
+    Failures are raised as SendError with the replies read so far.
+    """
+    for attempt in range(2):
+        resps: list[bytes] = []
+        try:
+            conn = _get_conn()
+            conn.sendall(data)
+            _quickack(conn)
+            for _ in range(count):
+                resps.append(_read_reply())
+            return resps
+        except socket.timeout as e:
+            _close_conn()
+            raise SendError(e, resps) from e
+        except OSError as e:
+            _close_conn()
+            if attempt or resps:
+                raise SendError(e, resps) from e
+
+
+threading.Thread(target=_modhost_io, name="modhost-io", daemon=True).start()
+
+
+def parse_resp_bytes(resp: bytes) -> Optional[int]:
+    """
+    Parse a raw b'resp <int>' reply and return the int, else None.
+    Works on the bytes straight from the reader: no decode or split.
+    """
+    # mod-host may include NUL bytes (you saw this in bash as "ignored null byte")
+    resp = resp.lstrip(b"\x00")
+    if not resp.startswith(b"resp "):
+        return None
+    end = resp.find(b" ", 5)
+    try:
+        return int(resp[5:end] if end >= 0 else resp[5:])
+    except ValueError:
+        return None
 
 
-def mod_param_set(instance_id: int, symbol: str, value: Any) -> None:
-    # param_set expects scalar values; keep as-is (numbers ok)
-    resp = send_cmd(f"param_set {instance_id} {symbol} {value}")
-    expect_zero(resp, f"param_set {instance_id} {symbol}")
+def _resp_text(resp: bytes) -> str:
+    return resp.replace(b"\x00", b"").decode("utf-8", errors="replace").strip()
 
 
-def mod_patch_set(instance_id: int, key: str, value: str) -> None:
-    # patch_set expects quoted key and quoted value
-    resp = send_cmd(f'patch_set {instance_id} "{key}" "{value}"')
-    expect_zero(resp, f"patch_set {instance_id} {key}")
+def expect_nonnegative(resp: bytes, what: str) -> int:
+    """
+    Accept any non-negative resp code as success; return code.
+    """
+    code = parse_resp_bytes(resp)
+    if code is None:
+        raise RuntimeError(f"{what} failed (unparseable): {_resp_text(resp)}")
+    if code < 0:
+        raise RuntimeError(f"{what} failed: {_resp_text(resp)}")
+    return code
 
 
-def mod_connect(src: str, dst: str) -> None:
-    resp = send_cmd(f'connect "{src}" "{dst}"')
-    expect_zero(resp, f"connect {src} -> {dst}")
+def expect_zero(resp: bytes, what: str) -> None:
+    """
+    Success iff resp == 0.
+    """
+    code = parse_resp_bytes(resp)
+    if code != 0:
+        raise RuntimeError(f"{what} failed: {_resp_text(resp)}")
 
 
+@functools.lru_cache(maxsize=512)
 def expand_port(port: str) -> str:
     """
     Convert pedalboard shorthand "40:out_left" to mod-host "effect_40:out_left".
     Leave system:*, mod-host:* etc untouched.
+
+    Cached: a plugin port usually appears in several connections.
     """
     if ":" in port:
         left, right = port.split(":", 1)
@@ -169,10 +347,29 @@ def expand_port(port: str) -> str:
             return f"effect_{left}:{right}"
     return port
 
+def flush_log(lines: list[str]) -> None:
+    """
+    Write a phase's buffered per-command log lines with one write and one
+    flush, instead of a print (and, on a pipe, a flush) per command.
+    """
+    if lines:
+        sys.stdout.write("".join(lines))
+        sys.stdout.flush()
+        lines.clear()
+
 # ---- JACK MIDI Handling ----
 
-event_q: "queue.Queue[bytes]" = queue.Queue(maxsize=2048)  # Incoming
-send_q: "queue.Queue[bytes]" = queue.Queue(maxsize=128)   # Outgoing
+# Lock-free SPSC ringbuffers between the audio thread and the main thread.
+# Each event is stored as a frame: "<H" length prefix + raw MIDI bytes.
+midi_rb = jack.RingBuffer(64 * 1024)  # Incoming, drained by main()
+pending_out = jack.RingBuffer(4096)   # Outgoing, drained by process()
+# Prebuilt "<H" prefixes for every short message length, so the callback
+# doesn't allocate one per event
+_LEN_PREFIX = [struct.pack("<H", n) for n in range(256)]
+# Status bytes (as 1-byte bytes) of the Program Changes the callback keeps
+_PC_STATUS = frozenset(
+    bytes([0xC0 | ch]) for ch in range(16) if FILTER_CHANNEL is None or ch == FILTER_CHANNEL
+)
 
 client = jack.Client("Router_Loader")
 in_port = client.midi_inports.register("input")
@@ -182,12 +379,24 @@ out_port = client.midi_outports.register("output")
 @client.set_process_callback 
 def process(frames):
     # --- 1) Incoming MIDI ---
-    # (This part of your code was fine)
+    # Never block or lock on the audio thread: drop events if full.
+    queued = False
     for offset, data in in_port.incoming_midi_events():
-        try:
-            event_q.put_nowait(bytes(data))
-        except queue.Full:
-            pass # Consider logging this, as it means you are losing data
+        # Only Program Change is acted on: drop notes, CCs, clock etc.
+        # before they reach the ringbuffer. (Indexing the JACK buffer
+        # yields a cached 1-byte bytes object, so this doesn't allocate.)
+        size = len(data)
+        if size < 2 or data[0] not in _PC_STATUS:
+            continue
+        if midi_rb.write_space < 2 + size:
+            continue
+        # Prefix, then the payload straight from the JACK buffer: no bytes
+        # copy or concatenation. The reader waits for the whole frame.
+        midi_rb.write(_LEN_PREFIX[size] if size < 256 else struct.pack("<H", size))
+        midi_rb.write(data)
+        queued = True
+    if queued:
+        wake()
 
     # --- 2) Outgoing MIDI ---
     
@@ -195,45 +404,28 @@ def process(frames):
     # This ensures that if the queue is empty, we send silence.
     out_port.clear_buffer()
 
-    # Now process all queued outgoing messages
-    while True:
-        try:
+    # Now process all queued outgoing messages. The writer only ever
+    # writes whole frames, so one read takes everything queued so far.
+    if pending_out.read_space:
+        buf = memoryview(pending_out.read(pending_out.read_space))
+        pos = 0
+        while pos + 2 <= len(buf):
+            (size,) = struct.unpack_from("<H", buf, pos)
+            pos += 2
             # We use 0 offset to send as soon as possible in this cycle.
             # If sending multiple messages, they will be sent 'simultaneously'
             # (in the same block), which MIDI devices handle fine.
-            msg = send_q.get_nowait()
-            out_port.write_midi_event(0, msg)
-        except queue.Empty:
+            out_port.write_midi_event(0, buf[pos:pos + size])
+            pos += size
+
+def read_midi_events():
+    """Yield every complete MIDI event currently in the ringbuffer."""
+    while midi_rb.read_space >= 2:
+        (size,) = struct.unpack("<H", midi_rb.peek(2))
+        if midi_rb.read_space < 2 + size:
             break
-
-def process_old(frames):
-    # 1) Incoming MIDI
-    for offset, data in in_port.incoming_midi_events():
-        try:
-            event_q.put_nowait(bytes(data))
-        except queue.Full:
-            pass
-            
-    # 2) Outgoing MIDI
-    # Process all queued outgoing messages
-    while True:
-        try:
-            out_port.clear_buffer()
-        except Exception:
-            pass
-        try:
-            # We write at offset 0 to send immediately in this cycle
-            msg = send_q.get_nowait()
-            out_port.write_midi_event(0, msg)
-        except queue.Empty:
-            break
-
-def decode_mido(event_bytes: bytes):
-    """Decode raw MIDI bytes into a mido Message if possible."""
-    try:
-        return mido.Message.from_bytes(event_bytes)
-    except ValueError:
-        return None
+        midi_rb.read_advance(2)
+        yield bytes(midi_rb.read(size))
 
 # ---- Main ----
 
@@ -244,11 +436,11 @@ def main() -> None:
 
     pb_path = Path(sys.argv[1])
     try:
-        pb = json.loads(pb_path.read_text(encoding="utf-8"))
+        pb = _json.loads(pb_path.read_bytes())
     except FileNotFoundError:
         print(f"Error: File not found: {pb_path}")
         sys.exit(1)
-    except json.JSONDecodeError as e:
+    except _json.JSONDecodeError as e:
         print(f"Error: Invalid JSON in {pb_path}: {e}")
         sys.exit(1)
 
@@ -256,30 +448,43 @@ def main() -> None:
     connections: list[dict[str, str]] = pb.get("connections", [])
 
     print("== Loading Plugins == ")
-    piano_ids = []
+    # Sort once by numeric id (deterministic behavior) and reuse for every pass
+    entries = sorted(((int(sid), p) for sid, p in plugins.items()), key=lambda t: t[0])
+    piano_ids = frozenset(inst for inst, p in entries if p["uri"] in PIANO_URIS)
     active_piano = None
 
     # Track resources for cleanup
     loaded_ids: list[int] = []
     active_connections: list[tuple[str, str]] = []
 
-    # 1) Add plugins (sorted by numeric id for deterministic behavior)
-    for sid in sorted(plugins.keys(), key=lambda x: int(x)):
-        p = plugins[sid]
+    # Commands are pipelined per phase: one write, then the replies are
+    # checked in command order. Their log lines are buffered the same way.
+    log: list[str] = []
+
+    # 1) Add plugins
+    adds: list[tuple[str, int, str]] = []  # (command, inst, uri)
+    for inst, p in entries:
         uri = p["uri"]
-        inst = int(sid)
-        if uri in (
-           "http://sfztools.github.io/sfizz",
-           "https://github.com/brummer10/Fluida.lv2",
-        ):
-            piano_ids.append(inst)
-
-        print(f'== add {inst} {uri}')
+        log.append(f"== add {inst} {uri}\n")
+        adds.append((f'add "{uri}" {inst}', inst, uri))
+    flush_log(log)
+
+    try:
+        resps = send_cmds([cmd for cmd, _, _ in adds])
+    except SendError as e:
+        print(f"Failed to add plugins: {e}")
+        resps = e.resps
+
+    for (_, inst, uri), resp in zip(adds, resps):
         try:
-            mod_add(uri, inst)
+            code = expect_nonnegative(resp, f"add {inst} {uri}")
             loaded_ids.append(inst)
         except Exception as e:
             print(f"Failed to add plugin {inst}: {e}")
+            continue
+        # Many builds return the created instance id.
+        if code != inst:
+            print(f"WARNING: add requested id={inst} but host returned resp {code}")
 
     # 1.5) Load saved state (Last Active Piano)
     restored_piano: Optional[int] = None
@@ -293,27 +498,13 @@ def main() -> None:
 
     # 2) Apply state (patch_set) and controls (param_set)
     print("== Applying State & Controls ==")
-    for sid in sorted(plugins.keys(), key=lambda x: int(x)):
-        p = plugins[sid]
-        inst = int(sid)
-
-        state = p.get("state", {}) or {}
-        for key, val in state.items():
-            print(f"== patch_set {inst} {key} = {val}")
-            try:
-                mod_patch_set(inst, key, str(val))
-            except Exception as e:
-                print(f"Failed patch_set {inst} {key}: {e}")
-
-        controls = p.get("controls", {}) or {}
-        for symbol, val in controls.items():
-            print(f"== param_set {inst} {symbol} {val}")
-            try:
-                mod_param_set(inst, symbol, val)
-            except Exception as e:
-                print(f"Failed param_set {inst} {symbol}: {e}")
-
+    setters: list[tuple[str, str, int, Optional[bool]]] = []  # (command, what, inst, bypass_on)
+    # State (e.g. the sfizz SFZ file, the slow part of loading) of pianos
+    # that start bypassed; applied when the piano is first selected.
+    deferred_state: dict[int, dict[str, Any]] = {}
+    for inst, p in entries:
         # 3) Optional bypass flag (boolean)
+        bypass_on: Optional[bool] = None
         if "bypass" in p:
             bypass_on = bool(p["bypass"])
 
@@ -324,25 +515,68 @@ def main() -> None:
                 else:
                     bypass_on = True
 
-            print(f"== bypass {inst} {1 if bypass_on else 0}")
-            try:
-                mod_bypass(inst, bypass_on)
-                if not bypass_on and inst in piano_ids:
-                    active_piano = inst
-            except Exception as e:
-                 print(f"Failed bypass {inst}: {e}")
+        state = p.get("state", {}) or {}
+        if state and bypass_on and inst in piano_ids:
+            log.append(f"== patch_set {inst}: deferred until piano {inst} is selected\n")
+            deferred_state[inst] = state
+            state = {}
+        for key, val in state.items():
+            log.append(f"== patch_set {inst} {key} = {val}\n")
+            # patch_set expects quoted key and quoted value
+            setters.append((f'patch_set {inst} "{key}" "{val}"', f"patch_set {inst} {key}", inst, None))
+
+        controls = p.get("controls", {}) or {}
+        for symbol, val in controls.items():
+            log.append(f"== param_set {inst} {symbol} {val}\n")
+            # param_set expects scalar values; keep as-is (numbers ok)
+            setters.append((f"param_set {inst} {symbol} {val}", f"param_set {inst} {symbol}", inst, None))
+
+        if bypass_on is not None:
+            log.append(f"== bypass {inst} {1 if bypass_on else 0}\n")
+            setters.append((f"bypass {inst} {1 if bypass_on else 0}", f"bypass {inst}", inst, bypass_on))
+    flush_log(log)
+
+    try:
+        resps = send_cmds([cmd for cmd, _, _, _ in setters])
+    except SendError as e:
+        print(f"Failed to apply state & controls: {e}")
+        resps = e.resps
+
+    for (_, what, inst, bypass_on), resp in zip(setters, resps):
+        try:
+            expect_zero(resp, what)
+        except Exception as e:
+            print(f"Failed {what}: {e}")
+            continue
+        if bypass_on is False and inst in piano_ids:
+            active_piano = inst
+
+    # Pre-encode both bypass commands for every piano
+    bypass_on_cmds = {inst: f"bypass {inst} 1\n".encode() for inst in piano_ids}
+    bypass_off_cmds = {inst: f"bypass {inst} 0\n".encode() for inst in piano_ids}
 
     # Small delay helps samplers settle before wiring audio
     time.sleep(0.2)
 
     # 3) Connect ports
     print("== Connecting Ports ==")
+    connects: list[tuple[str, str, str]] = []  # (command, src, dst)
     for c in connections:
         src = expand_port(c["from"])
         dst = expand_port(c["to"])
-        print(f"== connect {src} -> {dst}")
+        log.append(f"== connect {src} -> {dst}\n")
+        connects.append((f'connect "{src}" "{dst}"', src, dst))
+    flush_log(log)
+
+    try:
+        resps = send_cmds([cmd for cmd, _, _ in connects])
+    except SendError as e:
+        print(f"Failed to connect ports: {e}")
+        resps = e.resps
+
+    for (_, src, dst), resp in zip(connects, resps):
         try:
-            mod_connect(src, dst)
+            expect_zero(resp, f"connect {src} -> {dst}")
             active_connections.append((src, dst))
         except Exception as e:
              print(f"Failed connect {src}->{dst}: {e}")
@@ -377,12 +611,15 @@ def main() -> None:
 	            client.connect(out_port, sl_dest)
 	            print(f"[SL88 Sync] Connected {src_name} -> {dst_name}")
 
-	            # Build Program Change (COMMON_CHANNEL is 1-16; mido uses 0-15)
+	            # Build Program Change (COMMON_CHANNEL is 1-16; MIDI uses 0-15)
 	            status = 0xC0 | (COMMON_CHANNEL - 1)
 	            msg_bytes = bytes([status, active_piano])
 
 	            # Queue exactly once
-	            send_q.put(msg_bytes)
+	            frame = struct.pack("<H", len(msg_bytes)) + msg_bytes
+	            if pending_out.write_space < len(frame):
+	                raise RuntimeError("outgoing MIDI ringbuffer full")
+	            pending_out.write(frame)
 	            print(f"[SL88 Sync] Queued ONE-SHOT Program Change: {active_piano} on Ch{COMMON_CHANNEL} (Hex: {msg_bytes.hex()})")
 
 	        except Exception as e:
@@ -411,61 +648,90 @@ def main() -> None:
 
     try:
         while not stop_event.is_set():
-            try:
-                data = event_q.get(timeout=1.0)
-            except queue.Empty:
-                continue
-
-            msg = decode_mido(data)
-            if msg is None:
-                continue
-
-            # Debug print
-            # print(f"Received: {msg!r}")
-
-
-            if msg.type != "program_change":
-                continue
-
-            if FILTER_CHANNEL is not None and msg.channel != FILTER_CHANNEL:
-                continue
-
-            prog = msg.program
-
-            # Optional debounce
-            if prog == last_prog:
-                continue
-            last_prog = prog
-
-            if prog == KILL_PC:
-                print("[midi-shutdown] Shutdown via Program Change")
-                subprocess.run(["sudo", "/bin/systemctl", "poweroff"])
-                break
-
-            print(f"🎹 PROGRAM CHANGE -> program={prog}, channel={msg.channel}")
-
-            # Mapping Logic
-            if prog in piano_ids:
-                print(f"   Selecting Piano {prog}...")
-                
-                for inst in piano_ids:
-                    should_be_active = (inst == prog)
-                    bypass_val = False if should_be_active else True
-                    
+            # Sleeps until the callback queues input or a signal arrives
+            wait_for_wake()
+
+            for data in read_midi_events():
+                # The process callback only queues Program Change messages
+                # (already filtered by FILTER_CHANNEL).
+                if DEBUG:
+                    print(f"Received raw bytes: {data.hex()}")
+
+                channel = data[0] & 0x0F
+                prog = data[1]
+
+                # Optional debounce
+                if prog == last_prog:
+                    continue
+                last_prog = prog
+
+                if prog == KILL_PC:
+                    print("[midi-shutdown] Shutdown via Program Change")
+                    subprocess.run(["sudo", "/bin/systemctl", "poweroff"])
+                    stop_event.set()
+                    break
+
+                print(f"🎹 PROGRAM CHANGE -> program={prog}, channel={channel}")
+
+                # Mapping Logic
+                if prog in piano_ids:
+                    print(f"   Selecting Piano {prog}...")
+
+                    # First selection of a piano that started bypassed:
+                    # load its state before it goes live.
+                    state = deferred_state.get(prog)
+                    if state:
+                        print(f"   Applying deferred state for {prog}...")
+                        keys = list(state)
+                        try:
+                            resps = send_cmds([f'patch_set {prog} "{key}" "{state[key]}"' for key in keys])
+                        except SendError as e:
+                            print(f"   Failed to apply deferred state: {e}")
+                            resps = e.resps
+                        ok = len(resps) == len(keys)
+                        for key, resp in zip(keys, resps):
+                            try:
+                                expect_zero(resp, f"patch_set {prog} {key}")
+                            except Exception as e:
+                                print(f"   Failed patch_set {prog} {key}: {e}")
+                                ok = False
+                        if not ok:
+                            # Keep it deferred and the current piano live; selecting
+                            # this program again retries (so don't debounce it).
+                            print(f"   Piano {prog} has no state loaded, not switching")
+                            last_prog = None
+                            continue
+                        del deferred_state[prog]
+
+                    # Bypass every piano except the selected one, all in
+                    # one write (one round trip per Program Change)
+                    insts = list(piano_ids)
+                    payload = b"".join(
+                        bypass_off_cmds[inst] if inst == prog else bypass_on_cmds[inst] for inst in insts
+                    )
+                    pending = send_raw_async(payload, len(insts))
+
+                    # Save state while mod-host works on the switch
                     try:
-                         mod_bypass(inst, bypass_val)
+                        STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+                        STATE_FILE.write_text(json.dumps({"last_active_piano": prog}), encoding="utf-8")
+                        print(f"   [State] Saved active piano {prog} to {STATE_FILE}")
                     except Exception as e:
-                        print(f"   Failed to set bypass for {inst}: {e}")
-                
-                # Save state
-                try:
-                    STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
-                    STATE_FILE.write_text(json.dumps({"last_active_piano": prog}), encoding="utf-8")
-                    print(f"   [State] Saved active piano {prog} to {STATE_FILE}")
-                except Exception as e:
-                     print(f"   [State] Failed to save state: {e}")
-            else:
-                print(f"   (Program {prog} is not a known piano instance, ignoring switch)")
+                         print(f"   [State] Failed to save state: {e}")
+
+                    try:
+                        resps = pending.result()
+                    except SendError as e:
+                        print(f"   Failed to switch pianos: {e}")
+                        resps = e.resps
+
+                    for inst, resp in zip(insts, resps):
+                        try:
+                            expect_zero(resp, f"bypass {inst}")
+                        except Exception as e:
+                            print(f"   Failed to set bypass for {inst}: {e}")
+                else:
+                    print(f"   (Program {prog} is not a known piano instance, ignoring switch)")
 
     except KeyboardInterrupt:
         print("\nStopping...")
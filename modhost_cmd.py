@@ -10,21 +10,22 @@ TIMEOUT_S = 2.0
 
 def send_cmd(line: str) -> str:
     """
-    Send one mod-host command, return response text (NUL bytes removed).
+    Send one mod-host command, return response text (NUL terminator removed).
     """
     data = (line.rstrip("\n") + "\n").encode("utf-8", errors="replace")
     with socket.create_connection((MOD_HOST, MOD_PORT), timeout=TIMEOUT_S) as s:
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         s.sendall(data)
-        s.shutdown(socket.SHUT_WR)
-        resp = b""
-        while True:
+        # Replies end with a NUL, so no need to half-close and wait for EOF
+        buf = bytearray()
+        while b"\x00" not in buf:
             chunk = s.recv(4096)
             if not chunk:
                 break
-            resp += chunk
+            buf += chunk
 
-    # mod-host may include NUL bytes
-    resp = resp.replace(b"\x00", b"")
+    # The reply ends at the first NUL; anything after it is not part of it
+    resp = bytes(buf).split(b"\x00", 1)[0]
     return resp.decode("utf-8", errors="replace").strip()
 
 
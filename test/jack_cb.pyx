@@ -0,0 +1,160 @@
+# cython: language_level=3
+# distutils: libraries = jack
+"""
+Optional nogil JACK process callback for listen3.py and load.py.
+
+The pure-Python process() callback takes the GIL on every JACK cycle, so a
+busy consumer thread or a GC pass can make it miss its deadline (xrun).
+This module registers a C callback instead: Python never runs on the
+audio thread.
+
+It does the same work as the Python callback:
+- queues incoming Program Changes into the input jack.RingBuffer as
+  "<H" length-prefixed frames (FILTER_CHANNEL and debounce included),
+- writes one byte to a wakeup fd when something was queued,
+- optionally drains "<H"-framed messages from an output ringbuffer to a
+  MIDI out port.
+
+Build in this directory (needs Cython and the JACK development headers;
+libjack is linked via the distutils directive above, since jack-client
+doesn't load libjack's symbols globally):
+
+    cythonize -i -3 jack_cb.pyx
+
+The scripts fall back to their Python callback when this isn't built,
+and say why if jack_cb.pyx is present but can't be imported.
+"""
+
+from libc.stdint cimport uint32_t, uintptr_t
+from libc.stdlib cimport calloc
+from posix.unistd cimport write
+
+import jack
+
+
+cdef extern from "jack/jack.h" nogil:
+    ctypedef struct jack_client_t:
+        pass
+    ctypedef struct jack_port_t:
+        pass
+    ctypedef uint32_t jack_nframes_t
+    ctypedef int (*JackProcessCallback)(jack_nframes_t nframes, void *arg) noexcept nogil
+    int jack_set_process_callback(jack_client_t *client, JackProcessCallback cb, void *arg)
+    void *jack_port_get_buffer(jack_port_t *port, jack_nframes_t nframes)
+
+cdef extern from "jack/midiport.h" nogil:
+    ctypedef unsigned char jack_midi_data_t
+    ctypedef struct jack_midi_event_t:
+        jack_nframes_t time
+        size_t size
+        jack_midi_data_t *buffer
+    uint32_t jack_midi_get_event_count(void *port_buffer)
+    int jack_midi_event_get(jack_midi_event_t *event, void *port_buffer, uint32_t event_index)
+    void jack_midi_clear_buffer(void *port_buffer)
+    int jack_midi_event_write(void *port_buffer, jack_nframes_t time, const jack_midi_data_t *data, size_t data_size)
+
+cdef extern from "jack/ringbuffer.h" nogil:
+    ctypedef struct jack_ringbuffer_t:
+        pass
+    size_t jack_ringbuffer_write_space(const jack_ringbuffer_t *rb)
+    size_t jack_ringbuffer_write(jack_ringbuffer_t *rb, const char *src, size_t cnt)
+    size_t jack_ringbuffer_read_space(const jack_ringbuffer_t *rb)
+    size_t jack_ringbuffer_peek(jack_ringbuffer_t *rb, char *dest, size_t cnt)
+    size_t jack_ringbuffer_read(jack_ringbuffer_t *rb, char *dest, size_t cnt)
+    void jack_ringbuffer_read_advance(jack_ringbuffer_t *rb, size_t cnt)
+
+
+cdef struct cb_state:
+    jack_port_t *in_port
+    jack_ringbuffer_t *in_rb
+    jack_port_t *out_port       # NULL: no outgoing MIDI
+    jack_ringbuffer_t *out_rb
+    int filter_channel          # -1: all channels
+    int last_pc                 # -1: none yet
+    int wake_fd                 # -1: no wakeup
+
+
+cdef int process_cb(jack_nframes_t nframes, void *arg) noexcept nogil:
+    cdef cb_state *st = <cb_state *>arg
+    cdef void *buf = jack_port_get_buffer(st.in_port, nframes)
+    cdef jack_midi_event_t ev
+    cdef uint32_t i
+    cdef uint32_t count = jack_midi_get_event_count(buf)
+    cdef unsigned char frame[4]
+    cdef unsigned char msg[256]
+    cdef size_t size
+    cdef bint queued = False
+
+    # 1) Incoming MIDI: queue Program Changes only
+    for i in range(count):
+        if jack_midi_event_get(&ev, buf, i) != 0:
+            break
+        if ev.size < 2 or (ev.buffer[0] & 0xF0) != 0xC0:
+            continue
+        if st.filter_channel >= 0 and (ev.buffer[0] & 0x0F) != st.filter_channel:
+            continue
+        if ev.buffer[1] == st.last_pc:
+            continue
+        if jack_ringbuffer_write_space(st.in_rb) < 4:
+            continue
+        # "<H" length (2) + status + program
+        frame[0] = 2
+        frame[1] = 0
+        frame[2] = ev.buffer[0]
+        frame[3] = ev.buffer[1]
+        jack_ringbuffer_write(st.in_rb, <char *>frame, 4)
+        st.last_pc = ev.buffer[1]
+        queued = True
+
+    if queued and st.wake_fd >= 0:
+        write(st.wake_fd, b"x", 1)
+
+    # 2) Outgoing MIDI. The buffer must be cleared every cycle.
+    if st.out_port != NULL:
+        buf = jack_port_get_buffer(st.out_port, nframes)
+        jack_midi_clear_buffer(buf)
+        while jack_ringbuffer_read_space(st.out_rb) >= 2:
+            jack_ringbuffer_peek(st.out_rb, <char *>frame, 2)
+            size = frame[0] | (frame[1] << 8)
+            if jack_ringbuffer_read_space(st.out_rb) < 2 + size:
+                break
+            jack_ringbuffer_read_advance(st.out_rb, 2)
+            if size > sizeof(msg):
+                jack_ringbuffer_read_advance(st.out_rb, size)
+                continue
+            jack_ringbuffer_read(st.out_rb, <char *>msg, size)
+            jack_midi_event_write(buf, 0, msg, size)
+
+    return 0
+
+
+cdef uintptr_t _addr(obj) except 0:
+    # jack-client keeps the C pointer of clients, ports and ringbuffers in ._ptr
+    return <uintptr_t>int(jack._ffi.cast("uintptr_t", obj._ptr))
+
+
+# Python objects whose C pointers the callback uses; never released.
+_keepalive = []
+
+
+def install(client, in_port, in_rb, out_port=None, out_rb=None, filter_channel=None, wake_fd=-1):
+    """
+    Register the C process callback on `client` (before activate()),
+    in place of client.set_process_callback().
+    """
+    cdef cb_state *st = <cb_state *>calloc(1, sizeof(cb_state))
+    if st == NULL:
+        raise MemoryError()
+    st.in_port = <jack_port_t *>_addr(in_port)
+    st.in_rb = <jack_ringbuffer_t *>_addr(in_rb)
+    if out_port is not None:
+        st.out_port = <jack_port_t *>_addr(out_port)
+        st.out_rb = <jack_ringbuffer_t *>_addr(out_rb)
+    st.filter_channel = -1 if filter_channel is None else filter_channel
+    st.last_pc = -1
+    st.wake_fd = wake_fd
+
+    err = jack_set_process_callback(<jack_client_t *>_addr(client), process_cb, st)
+    if err:
+        raise jack.JackError(f"Error setting process callback ({err})")
+    _keepalive.extend([client, in_port, in_rb, out_port, out_rb])
@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
 import jack
-import mido
+import os
+import signal
 import time
 import socket
-import queue
+import struct
 import threading
 
 MOD_HOST = ("127.0.0.1", 5555)
@@ -21,40 +22,130 @@ TARGET_PORT = "system:midi_capture_1"
 # If you want to only react to a specific MIDI channel, set to 0..15; else None
 FILTER_CHANNEL = None  # e.g. 1 to match your earlier "c1 .." observations
 
+# Print the raw bytes of every Program Change received
+DEBUG = False
+
+try:
+    import jack_cb  # optional nogil process callback, see jack_cb.pyx
+except ImportError as e:
+    jack_cb = None
+    if os.path.exists(os.path.join(os.path.dirname(os.path.abspath(__file__)), "jack_cb.pyx")):
+        print(f"jack_cb not loaded ({e}); using the Python process callback")
+
 # ---- Mod-host control ----
 
 _mod_lock = threading.Lock()
-
-def send_modhost(cmd: str) -> None:
-    """Send a single command line to mod-host."""
+_mod_sock = None  # long-lived connection, opened on first use
+
+def _mod_conn() -> socket.socket:
+    global _mod_sock
+    if _mod_sock is None:
+        _mod_sock = socket.create_connection(MOD_HOST, timeout=0.5)
+        _mod_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return _mod_sock
+
+def _mod_reply(s: socket.socket) -> bytes:
+    """Read one NUL-terminated mod-host reply (terminator stripped)."""
+    buf = bytearray()
+    while b"\x00" not in buf:
+        chunk = s.recv(256)
+        if not chunk:
+            raise ConnectionError("mod-host closed the connection")
+        buf += chunk
+    return bytes(buf[:buf.index(0)])
+
+def send_modhost(cmd: str) -> str:
+    """Send a single command line to mod-host and return its reply."""
     # Keep this OUT of the JACK callback
+    global _mod_sock
+    data = (cmd + "\n").encode("utf-8")
     with _mod_lock:
-        with socket.create_connection(MOD_HOST, timeout=0.5) as s:
-            s.sendall((cmd + "\n").encode("utf-8"))
+        # Reuse one connection; reconnect once if mod-host dropped it
+        for attempt in range(2):
+            try:
+                s = _mod_conn()
+                s.sendall(data)
+                return _mod_reply(s).decode("utf-8", errors="replace")
+            except OSError as e:
+                if _mod_sock is not None:
+                    _mod_sock.close()
+                    _mod_sock = None
+                # A timed-out reply could arrive late and be misread as the
+                # next one, so never retry on timeout.
+                if attempt or isinstance(e, socket.timeout):
+                    raise
 
 # ---- JACK MIDI capture ----
 
-event_q: "queue.Queue[bytes]" = queue.Queue(maxsize=2048)
+# Lock-free SPSC ringbuffer between the audio thread and the main thread.
+# Each event is stored as a frame: "<H" length prefix + raw MIDI bytes.
+# The callback writes a byte to the wakeup pipe whenever it queues a frame.
+# A pipe (unlike threading.Event) can also be written by the optional C
+# callback in jack_cb.pyx.
+midi_rb = jack.RingBuffer(64 * 1024)
+_wake_r, _wake_w = os.pipe()
+os.set_blocking(_wake_w, False)
+stop_event = threading.Event()
+
+# Status bytes (as 1-byte bytes) of the Program Changes the callback keeps
+_PC_STATUS = frozenset(
+    bytes([0xC0 | ch]) for ch in range(16) if FILTER_CHANNEL is None or ch == FILTER_CHANNEL
+)
+
+# Program byte of the last Program Change queued by the process callback
+# (b"\xff" = none yet). Single writer (the audio thread), so a plain list
+# store is safe.
+_last_pc = [b"\xff"]
 
 client = jack.Client("Midi_Sniffer")
 in_port = client.midi_inports.register("input")
 
-@client.set_process_callback
+def wake():
+    """Wake the consumer; never blocks (a full pipe means one is pending)."""
+    try:
+        os.write(_wake_w, b"x")
+    except BlockingIOError:
+        pass
+
+def request_stop(*_):
+    """SIGINT/SIGTERM handler: end the main loop without polling."""
+    stop_event.set()
+    wake()
+
 def process(frames):
-    # Audio thread: do the absolute minimum, never block.
+    # Audio thread: do the absolute minimum, never block or lock.
     for offset, data in in_port.incoming_midi_events():
-        try:
-            event_q.put_nowait(bytes(data))
-        except queue.Full:
+        # Only Program Change is acted on: drop everything else before it
+        # reaches the ringbuffer. (Indexing the JACK buffer yields a cached
+        # 1-byte bytes object, so these checks don't allocate.)
+        if len(data) < 2 or data[0] not in _PC_STATUS:
+            continue
+        # Debounce identical Program Changes (some controllers spam PC)
+        if data[1] == _last_pc[0]:
+            continue
+        event = bytes(data)
+        frame = struct.pack("<H", len(event)) + event
+        if midi_rb.write_space < len(frame):
             # Drop events rather than blocking the audio thread
-            pass
-
-def decode_mido(event_bytes: bytes):
-    """Decode raw MIDI bytes into a mido Message if possible."""
-    try:
-        return mido.Message.from_bytes(event_bytes)
-    except ValueError:
-        return None
+            continue
+        midi_rb.write(frame)
+        _last_pc[0] = data[1]
+        # Wake the consumer only when something was queued
+        wake()
+
+if jack_cb is not None:
+    jack_cb.install(client, in_port, midi_rb, filter_channel=FILTER_CHANNEL, wake_fd=_wake_w)
+else:
+    client.set_process_callback(process)
+
+def read_midi_events():
+    """Yield every complete MIDI event currently in the ringbuffer."""
+    while midi_rb.read_space >= 2:
+        (size,) = struct.unpack("<H", midi_rb.peek(2))
+        if midi_rb.read_space < 2 + size:
+            break
+        midi_rb.read_advance(2)
+        yield bytes(midi_rb.read(size))
 
 def main():
     client.activate()
@@ -78,51 +169,40 @@ def main():
 
     print("Listening for MIDI events... (Ctrl+C to stop)")
 
-    last_prog = None
+    # Ctrl+C / systemd stop: handled as an event instead of KeyboardInterrupt
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
 
     try:
-        while True:
-            try:
-                data = event_q.get(timeout=1.0)
-            except queue.Empty:
-                continue
-
-            msg = decode_mido(data)
-
-            # Debug print (safe here; not in audio thread)
-            if msg is not None:
-                print(f"Received: {msg!r}")
-            else:
-                print(f"Received raw bytes: {list(data)}")
-
-            if msg is None or msg.type != "program_change":
-                continue
-
-            if FILTER_CHANNEL is not None and msg.channel != FILTER_CHANNEL:
-                continue
-
-            prog = msg.program
-
-            # Optional debounce (some controllers spam PC)
-            if prog == last_prog:
-                continue
-            last_prog = prog
-
-            print(f"🎹 PROGRAM CHANGE -> program={prog}, channel={msg.channel}")
-
-            cmds = PROGRAM_MAP.get(prog)
-            if not cmds:
-                print("⚠️  No mapping for this program")
-                continue
-
-            for cmd in cmds:
-                print(f"→ mod-host: {cmd}")
-                #try:
-                #    send_modhost(cmd)
-                #except OSError as e:
-                #    print(f"⚠️  mod-host send failed: {e}")
+        while not stop_event.is_set():
+            # Block until the callback (or a signal) writes to the pipe;
+            # one read swallows every wakeup byte queued so far.
+            os.read(_wake_r, 4096)
+
+            for data in read_midi_events():
+                # The process callback only queues Program Change messages
+                # (already filtered by FILTER_CHANNEL).
+                channel = data[0] & 0x0F
+                prog = data[1]
+
+                # Debug print (safe here; not in audio thread)
+                if DEBUG:
+                    print(f"Received raw bytes: {list(data)}")
+
+                print(f"🎹 PROGRAM CHANGE -> program={prog}, channel={channel}")
+
+                cmds = PROGRAM_MAP.get(prog)
+                if not cmds:
+                    print("⚠️  No mapping for this program")
+                    continue
+
+                for cmd in cmds:
+                    print(f"→ mod-host: {cmd}")
+                    #try:
+                    #    send_modhost(cmd)
+                    #except OSError as e:
+                    #    print(f"⚠️  mod-host send failed: {e}")
 
-    except KeyboardInterrupt:
         print("\nStopping...")
     finally:
         try:
@@ -7,7 +7,8 @@ Headless MOD-style pedalboard.json loader for mod-host.
   - connections: [ { "from": "...", "to": "..." }, ... ]
 
 - Talks to mod-host over TCP (default 127.0.0.1:5555) using its text protocol.
-- STARTS JACK CLIENT AFTER LOADING to listen for MIDI Program Changes.
+- STARTS JACK CLIENT AFTER LOADING to listen for MIDI Program Changes
+  (pass --no-listen to only load the pedalboard; jack is not imported then).
 - Switches plugins 10-16 based on Program Change 0-6.
 
 Compatibility notes:
@@ -16,247 +17,456 @@ Compatibility notes:
 - Errors are typically negative (e.g. resp -101).
 """
 
-import json
+import gc
 import os
+import re
+import signal
 import socket
+import struct
 import sys
 import time
-import queue
 import threading
 from pathlib import Path
 from typing import Any, Optional
 
-import jack
-import mido
+try:
+    import orjson as _json
+except ImportError:  # stdlib fallback; json.loads accepts bytes too
+    import json as _json
 
 # ---- Configuration ----
 
 MOD_HOST = os.environ.get("MOD_HOST", "127.0.0.1")
 MOD_PORT = int(os.environ.get("MOD_PORT", "5555"))
 TIMEOUT_S = float(os.environ.get("MOD_TIMEOUT", "5.0"))
+MAX_BATCH_BYTES = 64 * 1024  # Upper bound for one pipelined write to mod-host
 COMMON_CHANNEL = 2  # User confirmed Channel 2
 
 # Which JACK MIDI source to tap for Program Changes
 TARGET_PORT = "system:midi_capture_1"
+# Where the SL88 keyboard listens for the startup Program Change
+SL88_PORT = "system:midi_playback_1"
 FILTER_CHANNEL = None  # Set to 0-15 to filter by channel, or None for all
+DEBUG = False  # Print the raw bytes of every Program Change received
+
+# SCHED_FIFO priority for the Program Change worker (keep below JACK's)
+PC_WORKER_PRIORITY = 20
 
 # ---- Helper Functions ----
 
-def send_cmd(line: str) -> str:
+_conn: Optional[socket.socket] = None
+_reader = None  # buffered reader over _conn, keeps any bytes past a reply
+_conn_lock = threading.Lock()
+
+
+def _get_conn() -> socket.socket:
     """
-    Send one mod-host command, return response text (NUL bytes removed).
+    Return the long-lived mod-host socket, connecting on first use.
     """
-    data = (line.rstrip("\n") + "\n").encode("utf-8", errors="replace")
-    with socket.create_connection((MOD_HOST, MOD_PORT), timeout=TIMEOUT_S) as s:
-        s.sendall(data)
-        s.shutdown(socket.SHUT_WR)
-        resp = b""
-        while True:
-            chunk = s.recv(4096)
-            if not chunk:
-                break
-            resp += chunk
-
-    # mod-host may include NUL bytes (you saw this in bash as "ignored null byte")
-    resp = resp.replace(b"\x00", b"")
-    return resp.decode("utf-8", errors="replace").strip()
+    global _conn, _reader
+    if _conn is None:
+        _conn = socket.create_connection((MOD_HOST, MOD_PORT), timeout=TIMEOUT_S)
+        _conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        _reader = _conn.makefile("rb")
+    return _conn
+
+
+def _close_conn() -> None:
+    global _conn, _reader
+    try:
+        if _reader is not None:
+            _reader.close()
+        if _conn is not None:
+            _conn.close()
+    except OSError:
+        pass
+    _conn = None
+    _reader = None
 
 
-def parse_resp(resp: str) -> Optional[int]:
+def _read_reply() -> bytes:
     """
-    Parse 'resp <int>' and return the int, else None.
+    Read one reply from mod-host. Replies are terminated by a NUL byte,
+    which is stripped.
     """
-    r = resp.strip().replace("\x00", "")
-    if not r.startswith("resp "):
-        return None
-    parts = r.split()
-    if len(parts) < 2:
-        return None
+    buf = bytearray()
+    while True:
+        chunk = _reader.peek()
+        if not chunk:
+            raise ConnectionError("mod-host closed the connection")
+        end = chunk.find(b"\x00")
+        if end >= 0:
+            buf += _reader.read(end + 1)
+            del buf[-1]
+            return bytes(buf)
+        buf += _reader.read(len(chunk))
+
+
+def send_cmd(line: str) -> bytes:
+    """
+    Send one mod-host command over the shared connection and return the
+    raw response (NUL terminator removed).
+    """
+    return send_many([line])[0]
+
+
+class SendError(Exception):
+    """
+    A pipelined send failed part-way. `resps` holds the replies read
+    before the failure, in command order, so callers can still account
+    for the commands mod-host did carry out.
+    """
+
+    def __init__(self, cause: Exception, resps: list[bytes]):
+        super().__init__(str(cause))
+        self.resps = resps
+
+
+def send_many(cmds: list[str]) -> list[bytes]:
+    """
+    Pipeline several mod-host commands: write them all back-to-back, then
+    read one NUL-terminated reply per command. Raw replies are returned
+    in command order; on failure SendError carries the ones read so far.
+
+    Batches are capped at about MAX_BATCH_BYTES so a huge pedalboard can't
+    fill both socket buffers (us still writing, mod-host blocked on its
+    replies).
+    """
+    resps: list[bytes] = []
+    batch: list[bytes] = []
+    size = 0
+    for line in cmds:
+        cmd = (line.rstrip("\n") + "\n").encode("utf-8", errors="replace")
+        if batch and size + len(cmd) > MAX_BATCH_BYTES:
+            _send_batch(batch, resps)
+            batch = []
+            size = 0
+        batch.append(cmd)
+        size += len(cmd)
+    if batch:
+        _send_batch(batch, resps)
+    return resps
+
+
+def _send_batch(cmds: list[bytes], resps: list[bytes]) -> None:
+    """Send one batch of encoded commands and append its replies to `resps`."""
     try:
-        return int(parts[1])
-    except ValueError:
+        resps += send_raw(b"".join(cmds), len(cmds))
+    except SendError as e:
+        e.resps = resps + e.resps
+        raise
+
+
+def send_raw(data: bytes, count: int) -> list[bytes]:
+    """
+    Write pre-encoded, newline-terminated commands as-is and read `count`
+    replies. Used by hot paths that cache their command bytes.
+
+    A dropped connection is re-opened and the batch retried once, unless
+    some replies were already read (retrying would repeat those commands).
+    A timeout is not retried: a late reply would be mistaken for the
+    answer to the next command, so the connection is discarded instead.
+    Failures are raised as SendError with the replies read so far.
+    """
+    if not count:
+        return []
+    with _conn_lock:
+        for attempt in range(2):
+            resps: list[bytes] = []
+            try:
+                _get_conn().sendall(data)
+                for _ in range(count):
+                    resps.append(_read_reply())
+                return resps
+            except socket.timeout as e:
+                _close_conn()
+                raise SendError(e, resps) from e
+            except OSError as e:
+                _close_conn()
+                if attempt or resps:
+                    raise SendError(e, resps) from e
+
+
+_RESP_RE = re.compile(rb"resp\s+(-?\d+)")
+
+
+def parse_resp(resp: bytes) -> Optional[int]:
+    """
+    Parse b'resp <int>' and return the int, else None.
+    """
+    m = _RESP_RE.match(resp.lstrip(b"\x00 \r\n"))
+    if m is None:
         return None
+    return int(m.group(1))
+
+
+def _resp_text(resp: bytes) -> str:
+    return resp.decode("utf-8", errors="replace").strip()
 
 
-def expect_nonnegative(resp: str, what: str) -> int:
+def expect_nonnegative(resp: bytes, what: str) -> int:
     """
     Accept any non-negative resp code as success; return code.
     """
     code = parse_resp(resp)
     if code is None:
-        raise RuntimeError(f"{what} failed (unparseable): {resp}")
+        raise RuntimeError(f"{what} failed (unparseable): {_resp_text(resp)}")
     if code < 0:
-        raise RuntimeError(f"{what} failed: {resp}")
+        raise RuntimeError(f"{what} failed: {_resp_text(resp)}")
     return code
 
 
-def expect_zero(resp: str, what: str) -> None:
+def expect_zero(resp: bytes, what: str) -> None:
     """
     Success iff resp == 0.
     """
     code = parse_resp(resp)
     if code != 0:
-        raise RuntimeError(f"{what} failed: {resp}")
-
-
-def mod_preload(uri: str, instance_id: int) -> None:
-    resp = send_cmd(f'preload "{uri}" {instance_id}')
-    code = expect_nonnegative(resp, f'add {instance_id} {uri}')
-    # Many builds return the created instance id.
-    if code != instance_id:
-        print(f"WARNING: add requested id={instance_id} but host returned resp {code}")
-
-
-def mod_bypass(inst: int, bypass_on: bool) -> None:
-    # bypass_on=True  -> "bypass <inst> 1"
-    # bypass_on=False -> "bypass <inst> 0"
-    resp = send_cmd(f"bypass {inst} {1 if bypass_on else 0}")
-    expect_zero(resp, f"bypass {inst}")
-
-def mod_add(uri: str, instance_id: int) -> None:
-    resp = send_cmd(f'add "{uri}" {instance_id}')
-    code = expect_nonnegative(resp, f'add {instance_id} {uri}')
-    # Many builds return the created instance id.
-    if code != instance_id:
-        print(f"WARNING: add requested id={instance_id} but host returned resp {code}")
-
-
-def mod_param_set(instance_id: int, symbol: str, value: Any) -> None:
-    # param_set expects scalar values; keep as-is (numbers ok)
-    resp = send_cmd(f"param_set {instance_id} {symbol} {value}")
-    expect_zero(resp, f"param_set {instance_id} {symbol}")
+        raise RuntimeError(f"{what} failed: {_resp_text(resp)}")
 
 
-def mod_patch_set(instance_id: int, key: str, value: str) -> None:
-    # patch_set expects quoted key and quoted value
-    resp = send_cmd(f'patch_set {instance_id} "{key}" "{value}"')
-    expect_zero(resp, f"patch_set {instance_id} {key}")
+def expand_port_bytes(port: str, port_map: dict[str, bytes]) -> bytes:
+    """
+    Convert pedalboard shorthand "40:out_left" to mod-host b"effect_40:out_left",
+    using port_map (plugin id -> b"effect_<id>") built once per pedalboard.
+    Leave system:*, mod-host:* etc untouched.
+    """
+    left, sep, right = port.partition(":")
+    if sep and left in port_map:
+        return port_map[left] + b":" + right.encode("utf-8")
+    return port.encode("utf-8")
 
+# ---- JACK MIDI Handling ----
 
-def mod_connect(src: str, dst: str) -> None:
-    resp = send_cmd(f'connect "{src}" "{dst}"')
-    expect_zero(resp, f"connect {src} -> {dst}")
+# Lock-free SPSC ringbuffer between the audio thread and the main thread.
+# Each event is stored as a frame: "<H" length prefix + raw MIDI bytes.
+# The callback writes a byte to the wakeup pipe whenever it queues a frame.
+# A pipe (unlike threading.Event) can also be written by the optional C
+# callback in jack_cb.pyx.
+_wake_r, _wake_w = os.pipe()
+os.set_blocking(_wake_w, False)
+stop_event = threading.Event()
+
+# Status bytes (as 1-byte bytes) of the Program Changes the callback keeps
+_PC_STATUS = frozenset(
+    bytes([0xC0 | ch]) for ch in range(16) if FILTER_CHANNEL is None or ch == FILTER_CHANNEL
+)
+
+# Program byte of the last Program Change queued by the process callback
+# (b"\xff" = none yet). Single writer (the audio thread), so a plain list
+# store is safe.
+_last_pc = [b"\xff"]
+
+# JACK objects are created by start_jack() once the pedalboard is loaded,
+# so `jack` (and libjack) is only imported when the listener actually runs.
+jack = None
+client = None
+in_port = None
+sl88_out = None
+midi_rb = None
+# Outgoing MIDI for the SL88, same framing; written by the main thread,
+# drained by the process callback.
+pending_out = None
+
+
+def start_jack() -> None:
+    """
+    Import jack and create the Router_Loader client, its ports and the
+    ringbuffers shared with the process callback. Does not activate it.
+    """
+    global jack, client, in_port, sl88_out, midi_rb, pending_out
+    import jack
+    try:
+        import jack_cb  # optional nogil process callback, see jack_cb.pyx
+    except ImportError as e:
+        jack_cb = None
+        if Path(__file__).with_name("jack_cb.pyx").exists():
+            print(f"jack_cb not loaded ({e}); using the Python process callback")
+
+    midi_rb = jack.RingBuffer(64 * 1024)
+    pending_out = jack.RingBuffer(64)
+
+    client = jack.Client("Router_Loader")
+    in_port = client.midi_inports.register("input")
+    sl88_out = client.midi_outports.register("sl88_out")
+    if jack_cb is not None:
+        jack_cb.install(client, in_port, midi_rb, sl88_out, pending_out, FILTER_CHANNEL, _wake_w)
+        print("Using the C process callback (jack_cb)")
+    else:
+        client.set_process_callback(process)
+
+
+def wake() -> None:
+    """
+    Wake the consumer. Never blocks: if the pipe is full a wakeup is
+    already pending.
+    """
+    try:
+        os.write(_wake_w, b"x")
+    except BlockingIOError:
+        pass
 
 
-def expand_port(port: str) -> str:
+def request_stop(*_) -> None:
     """
-    Convert pedalboard shorthand "40:out_left" to mod-host "effect_40:out_left".
-    Leave system:*, mod-host:* etc untouched.
+    SIGINT/SIGTERM handler: stop the worker and the main thread, waking
+    both without any polling timeout.
     """
-    if ":" in port:
-        left, right = port.split(":", 1)
-        if left.isdigit():
-            return f"effect_{left}:{right}"
-    return port
+    stop_event.set()
+    wake()
 
-# ---- Helper Functions ----
 
-def sync_sl88(program: int):
+def process(frames):
+    # 1) Incoming MIDI (never block or lock on the audio thread)
+    for offset, data in in_port.incoming_midi_events():
+        # Only Program Change is acted on: drop everything else before it
+        # reaches the ringbuffer. (Indexing the JACK buffer yields a cached
+        # 1-byte bytes object, so these checks don't allocate.)
+        if len(data) < 2 or data[0] not in _PC_STATUS:
+            continue
+        # Debounce identical Program Changes (some controllers spam PC)
+        if data[1] == _last_pc[0]:
+            continue
+        event = bytes(data)
+        frame = struct.pack("<H", len(event)) + event
+        if midi_rb.write_space < len(frame):
+            continue
+        midi_rb.write(frame)
+        _last_pc[0] = data[1]
+        # Wake the consumer only when something was queued
+        wake()
+
+    # 2) Outgoing MIDI (SL88 sync). The buffer must be cleared every cycle.
+    sl88_out.clear_buffer()
+    while pending_out.read_space >= 2:
+        (size,) = struct.unpack("<H", pending_out.peek(2))
+        if pending_out.read_space < 2 + size:
+            break
+        pending_out.read_advance(2)
+        sl88_out.write_midi_event(0, pending_out.read(size))
+
+def sync_sl88(program: int) -> None:
     """
-    Spins up a temporary JACK client to send a single Program Change message
-    to the SL88 keyboard (via system:midi_playback_1), then exits.
+    Queue a Program Change for the SL88 keyboard on our own sl88_out port;
+    the process callback sends it on the next cycle.
+    """
+    msg = bytes([0xC0 | (COMMON_CHANNEL - 1), program])
+    frame = struct.pack("<H", len(msg)) + msg
+    if pending_out.write_space < len(frame):
+        print("[SL88 Sync] Outgoing queue full, dropping Program Change")
+        return
+    pending_out.write(frame)
+    print(f"[SL88 Sync] Queued Program Change {program} on Ch{COMMON_CHANNEL} (Hex: {msg.hex()})")
+
+def read_midi_events():
+    """Yield every complete MIDI event currently in the ringbuffer."""
+    while midi_rb.read_space >= 2:
+        (size,) = struct.unpack("<H", midi_rb.peek(2))
+        if midi_rb.read_space < 2 + size:
+            break
+        midi_rb.read_advance(2)
+        yield bytes(midi_rb.read(size))
+
+def pc_worker(bypass_plan: dict[int, list[tuple[int, bool, bytes]]], bypass_state: dict[int, bool]) -> None:
+    """
+    Drain Program Changes from the ringbuffer and switch pianos.
+
+    Runs on its own thread at SCHED_FIFO priority where permitted (needs
+    CAP_SYS_NICE). The cyclic GC is paused while the worker runs so a
+    collection can't land between a PC and its bypass switch; it collects
+    explicitly after each burst of events instead.
     """
-    print(f"[SL88 Sync] Starting temporary client to set program={program}...")
-    
     try:
-        tmp_client = jack.Client("Router_Sync")
-        out = tmp_client.midi_outports.register("out")
-        done = threading.Event()
-        sent = False
-        
-        # We need to capture 'program' in the closure
-        # 0xC0 | (2-1) = 0xC1 for Channel 2
-        status = 0xC0 | (COMMON_CHANNEL - 1)
-        # Using a list for the bytes to ensure it's mutable if needed, passed to bytes()
-        msg_bytes = bytes([status, program])
-
-        @tmp_client.set_process_callback
-        def process(frames):
-            nonlocal sent
-            if sent:
-                return
-            # Write immediately at offset 0
-            out.write_midi_event(0, msg_bytes)
-            sent = True
-            done.set()
-        
-        print("[SL88 Sync] Activating client...")
-        tmp_client.activate()
-        
-        target_port_name = "system:midi_playback_1"
-        try:
-            target = tmp_client.get_port_by_name(target_port_name)
-            if target:
-                print(f"[SL88 Sync] Connecting to {target_port_name}...")
-                tmp_client.connect(out, target)
-                
-                print("[SL88 Sync] Waiting for process cycle to send...")
-                # Wait up to 2 seconds for JACK to cycle
-                if done.wait(2.0):
-                    print(f"[SL88 Sync] SUCCESS: Sent Program Change {program} on Ch{COMMON_CHANNEL} (Hex: {msg_bytes.hex()})")
-                    # Give JACK audio thread a moment to flush the buffer before we close
-                    time.sleep(0.25)
-                else:
-                    print("[SL88 Sync] TIMEOUT: Did not send message within 2.0s")
-            else:
-                print(f"[SL88 Sync] ERROR: Could not find JACK port '{target_port_name}'")
-        except jack.JackError as e:
-            print(f"[SL88 Sync] JackError during connection: {e}")
-            
-    except Exception as e:
-        print(f"[SL88 Sync] Exception: {e}")
-    finally:
-        # Clean up
+        # On Linux, pid 0 means the calling thread
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(PC_WORKER_PRIORITY))
+        print(f"[pc-worker] Running at SCHED_FIFO priority {PC_WORKER_PRIORITY}")
+    except (AttributeError, OSError) as e:
+        print(f"[pc-worker] Could not set SCHED_FIFO ({e}), using default priority")
+
+    # Warm up the dispatch path (socket, reply parsing) with an idempotent
+    # re-send of a bypass state mod-host already has.
+    for inst, bypass_on in list(bypass_state.items())[:1]:
         try:
-            if 'tmp_client' in locals() and tmp_client:
-                tmp_client.deactivate()
-                tmp_client.close()
-                print("[SL88 Sync] Client closed.")
+            resp = send_raw(f"bypass {inst} {1 if bypass_on else 0}\n".encode(), 1)[0]
+            expect_zero(resp, f"bypass {inst}")
         except Exception as e:
-            pass
+            print(f"[pc-worker] Warm-up failed: {e}")
 
-# ---- JACK MIDI Handling ----
+    gc.collect()
+    gc.freeze()
+    gc.disable()
+    try:
+        while not stop_event.is_set():
+            # Block until the callback (or shutdown) writes to the pipe;
+            # one read swallows every wakeup byte queued so far.
+            os.read(_wake_r, 4096)
 
-event_q: "queue.Queue[bytes]" = queue.Queue(maxsize=2048)
+            for data in read_midi_events():
+                # The process callback only queues Program Change messages
+                # (already filtered by FILTER_CHANNEL).
+                channel = data[0] & 0x0F
+                prog = data[1]
 
-# (No more global one-shot state needed here)
+                # Debug print
+                if DEBUG:
+                    print(f"Received raw bytes: {list(data)}")
 
-client = jack.Client("Router_Loader")
-in_port = client.midi_inports.register("input")
-# (No output port needed on the main listener)
+                print(f"🎹 PROGRAM CHANGE -> program={prog}, channel={channel}")
 
-@client.set_process_callback
-def process(frames):
-    # 1) Incoming MIDI
-    for offset, data in in_port.incoming_midi_events():
-        try:
-            event_q.put_nowait(bytes(data))
-        except queue.Full:
-            pass
-            
-    # No outgoing MIDI logic here anymore
+                # Mapping Logic
+                # If the program number matches one of our known piano instances,
+                # enable that one and bypass the others.
+
+                if prog in bypass_plan:
+                    print(f"   Selecting Piano {prog}...")
+
+                    # Only send the bypass changes mod-host doesn't already have
+                    pending = [step for step in bypass_plan[prog] if bypass_state.get(step[0]) != step[1]]
+                    try:
+                        resps = send_raw(b"".join(cmd for _, _, cmd in pending), len(pending))
+                    except SendError as e:
+                        print(f"   Failed to switch pianos: {e}")
+                        resps = e.resps
+                        # Unanswered bypasses: mod-host's state is unknown
+                        for inst, _, _ in pending[len(resps):]:
+                            bypass_state.pop(inst, None)
+
+                    for (inst, bypass_on, _), resp in zip(pending, resps):
+                        try:
+                            expect_zero(resp, f"bypass {inst}")
+                            bypass_state[inst] = bypass_on
+                        except Exception as e:
+                            bypass_state.pop(inst, None)
+                            print(f"   Failed to set bypass for {inst}: {e}")
+                else:
+                    print(f"   (Program {prog} is not a known piano instance, ignoring switch)")
+
+            # Going idle: safe moment for a collection
+            gc.collect()
+    finally:
+        gc.enable()
+        # Let main() shut down if the worker exits for any reason
+        stop_event.set()
 
-def decode_mido(event_bytes: bytes):
-    """Decode raw MIDI bytes into a mido Message if possible."""
-    try:
-        return mido.Message.from_bytes(event_bytes)
-    except ValueError:
-        return None
 
 # ---- Main ----
 
 def main() -> None:
-    if len(sys.argv) != 2:
-        print(f"Usage: {sys.argv[0]} /path/to/pedalboard.json", file=sys.stderr)
+    args = sys.argv[1:]
+    # --no-listen: load the pedalboard and exit without starting JACK
+    listen = "--no-listen" not in args
+    args = [a for a in args if a != "--no-listen"]
+    if len(args) != 1:
+        print(f"Usage: {sys.argv[0]} [--no-listen] /path/to/pedalboard.json", file=sys.stderr)
         sys.exit(2)
 
-    pb_path = Path(sys.argv[1])
+    pb_path = Path(args[0])
     try:
-        pb = json.loads(pb_path.read_text(encoding="utf-8"))
+        pb = _json.loads(pb_path.read_bytes())
     except FileNotFoundError:
         print(f"Error: File not found: {pb_path}")
         sys.exit(1)
-    except json.JSONDecodeError as e:
+    except _json.JSONDecodeError as e:
         print(f"Error: Invalid JSON in {pb_path}: {e}")
         sys.exit(1)
 
@@ -264,87 +474,145 @@ def main() -> None:
     connections: list[dict[str, str]] = pb.get("connections", [])
 
     print("== Loading Plugins == ")
-    piano_ids = []
     active_piano = None
+    # Last bypass state we know mod-host holds for each piano (True = bypassed)
+    bypass_state: dict[int, bool] = {}
 
-    # 1) Add plugins (sorted by numeric id for deterministic behavior)
-    for sid in sorted(plugins.keys(), key=lambda x: int(x)):
-        p = plugins[sid]
-        uri = p["uri"]
-        inst = int(sid)
-        if uri == "http://sfztools.github.io/sfizz":
-            piano_ids.append(inst)
+    # Sort once by numeric id (deterministic behavior) and reuse for every pass
+    ordered = sorted(((int(sid), p) for sid, p in plugins.items()), key=lambda t: t[0])
+    piano_ids = [inst for inst, p in ordered if p["uri"] == "http://sfztools.github.io/sfizz"]
 
+    # The whole bring-up (add, then state/controls/bypass) is built as one
+    # script and sent to mod-host in a single write; replies come back in
+    # command order and are checked afterwards.
+
+    # 1) Add plugins
+    adds: list[tuple[str, int, str]] = []  # (command, inst, uri)
+    for inst, p in ordered:
+        uri = p["uri"]
         print(f'== add {inst} {uri}')
-        try:
-            mod_add(uri, inst)
-        except Exception as e:
-            print(f"Failed to add plugin {inst}: {e}")
+        adds.append((f'add "{uri}" {inst}', inst, uri))
 
     # 2) Apply state (patch_set) and controls (param_set)
     print("== Applying State & Controls ==")
-    for sid in sorted(plugins.keys(), key=lambda x: int(x)):
-        p = plugins[sid]
-        inst = int(sid)
-
-        state = p.get("state", {}) or {}
-        for key, val in state.items():
+    setters: list[tuple[str, str, int, Optional[bool]]] = []  # (command, description, inst, bypass_on)
+    for inst, p in ordered:
+        state = p.get("state")
+        for key, val in (state.items() if state else ()):
             print(f"== patch_set {inst} {key} = {val}")
-            try:
-                mod_patch_set(inst, key, str(val))
-            except Exception as e:
-                print(f"Failed patch_set {inst} {key}: {e}")
+            # patch_set expects quoted key and quoted value
+            setters.append((f'patch_set {inst} "{key}" "{val}"', f"patch_set {inst} {key}", inst, None))
 
-        controls = p.get("controls", {}) or {}
-        for symbol, val in controls.items():
+        controls = p.get("controls")
+        for symbol, val in (controls.items() if controls else ()):
             print(f"== param_set {inst} {symbol} {val}")
-            try:
-                mod_param_set(inst, symbol, val)
-            except Exception as e:
-                print(f"Failed param_set {inst} {symbol}: {e}")
+            # param_set expects scalar values; keep as-is (numbers ok)
+            setters.append((f"param_set {inst} {symbol} {val}", f"param_set {inst} {symbol}", inst, None))
 
         # 3) Optional bypass flag (boolean)
         if "bypass" in p:
             bypass_on = bool(p["bypass"])
             print(f"== bypass {inst} {1 if bypass_on else 0}")
-            try:
-                mod_bypass(inst, bypass_on)
-                if not bypass_on and inst in piano_ids:
-                    active_piano = inst
-            except Exception as e:
-                 print(f"Failed bypass {inst}: {e}")
+            setters.append((f"bypass {inst} {1 if bypass_on else 0}", f"bypass {inst}", inst, bypass_on))
+
+    script = [cmd for cmd, _, _ in adds] + [cmd for cmd, _, _, _ in setters]
+    try:
+        resps = send_many(script)
+    except SendError as e:
+        print(f"Failed to load pedalboard: {e}")
+        # Replies read before the failure are still checked below; whether
+        # the rest of the script ran is unknown.
+        resps = e.resps
+        for cmd in script[len(resps):]:
+            print(f"No reply for: {cmd}")
+
+    for (_, inst, uri), resp in zip(adds, resps):
+        try:
+            code = expect_nonnegative(resp, f"add {inst} {uri}")
+        except Exception as e:
+            print(f"Failed to add plugin {inst}: {e}")
+            continue
+        # Many builds return the created instance id.
+        if code != inst:
+            print(f"WARNING: add requested id={inst} but host returned resp {code}")
+
+    for (_, what, inst, bypass_on), resp in zip(setters, resps[len(adds):]):
+        try:
+            expect_zero(resp, what)
+        except Exception as e:
+            print(f"Failed {what}: {e}")
+            continue
+        if bypass_on is not None and inst in piano_ids:
+            bypass_state[inst] = bypass_on
+            if not bypass_on:
+                active_piano = inst
+
+    # Pre-encode both bypass commands for every piano, then precompute the
+    # steps that select each program: program -> [(inst, bypass_on, command)]
+    bypass_on_cmds = {inst: f"bypass {inst} 1\n".encode() for inst in piano_ids}
+    bypass_off_cmds = {inst: f"bypass {inst} 0\n".encode() for inst in piano_ids}
+    bypass_plan: dict[int, list[tuple[int, bool, bytes]]] = {
+        prog: [
+            (inst, False, bypass_off_cmds[inst]) if inst == prog else (inst, True, bypass_on_cmds[inst])
+            for inst in piano_ids
+        ]
+        for prog in piano_ids
+    }
 
     # Small delay helps samplers settle before wiring audio
     time.sleep(0.2)
 
     # 3) Connect ports
     print("== Connecting Ports ==")
+    # Rewrite every connection once into ready-to-send command bytes
+    port_map = {sid: f"effect_{sid}".encode() for sid in plugins}
+    connect_cmds: list[tuple[bytes, str]] = []  # (command, description)
     for c in connections:
-        src = expand_port(c["from"])
-        dst = expand_port(c["to"])
-        print(f"== connect {src} -> {dst}")
+        src = expand_port_bytes(c["from"], port_map)
+        dst = expand_port_bytes(c["to"], port_map)
+        what = f"connect {src.decode()} -> {dst.decode()}"
+        print(f"== {what}")
+        connect_cmds.append((b'connect "' + src + b'" "' + dst + b'"\n', what))
+
+    try:
+        resps = send_raw(b"".join(cmd for cmd, _ in connect_cmds), len(connect_cmds))
+    except SendError as e:
+        print(f"Failed to connect ports: {e}")
+        resps = e.resps
+        for _, what in connect_cmds[len(resps):]:
+            print(f"No reply for: {what}")
+    for (_, what), resp in zip(connect_cmds, resps):
         try:
-            mod_connect(src, dst)
+            expect_zero(resp, what)
         except Exception as e:
-             print(f"Failed connect {src}->{dst}: {e}")
+            print(f"Failed {what}: {e}")
 
     print("== done loading ==")
     print("---------------------------------------------------")
-    
-    # 4) Sync SL88 (Temporary dedicated client)
-    if active_piano is not None:
-        sync_sl88(active_piano)
+
+    if not listen:
+        return
 
     print("Starting JACK MIDI listener for Program Changes...")
-    print(f"Started JACK client: {client.name}")
-    # (Client already activated above)
-    # Activate JACK Client
+    # Create and activate JACK Client
     try:
+        start_jack()
+        print(f"Started JACK client: {client.name}")
         client.activate()
     except Exception as e:
         print(f"Failed to activate JACK client: {e}")
         return
 
+    # 4) Sync SL88 through our own output port (connected once)
+    if active_piano is not None:
+        try:
+            target = client.get_port_by_name(SL88_PORT)
+            client.connect(sl88_out, target)
+            print(f"[SL88 Sync] Connected {sl88_out.name} -> {SL88_PORT}")
+            sync_sl88(active_piano)
+        except jack.JackError as e:
+            print(f"[SL88 Sync] Could not connect to {SL88_PORT}: {e}")
+
     print(f"Listening on: {client.name}:input")
 
     # Try to auto-connect
@@ -362,60 +630,21 @@ def main() -> None:
     print("Listening for MIDI events... (Ctrl+C to stop)")
     print(f"Mapping: Program Change X -> Piano Instance X. Detected Pianos: {sorted(piano_ids)}")
 
-    last_prog = None
+    # Ctrl+C / systemd stop: handled as an event instead of KeyboardInterrupt
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
 
-    try:
-        while True:
-            try:
-                data = event_q.get(timeout=1.0)
-            except queue.Empty:
-                continue
-
-            msg = decode_mido(data)
-            if msg is None:
-                continue
-
-            # Debug print
-            # print(f"Received: {msg!r}")
-
-            if msg.type != "program_change":
-                continue
-
-            if FILTER_CHANNEL is not None and msg.channel != FILTER_CHANNEL:
-                continue
-
-            prog = msg.program
-
-            # Optional debounce
-            if prog == last_prog:
-                continue
-            last_prog = prog
-
-            print(f"🎹 PROGRAM CHANGE -> program={prog}, channel={msg.channel}")
-
-            # Mapping Logic
-            # If the program number matches one of our known piano instances,
-            # enable that one and bypass the others.
-            
-            if prog in piano_ids:
-                print(f"   Selecting Piano {prog}...")
-                
-                for inst in piano_ids:
-                    # If this is the one we want, bypass=False (active)
-                    # If this is NOT the one, bypass=True (bypassed)
-                    should_be_active = (inst == prog)
-                    bypass_val = False if should_be_active else True
-                    
-                    try:
-                         mod_bypass(inst, bypass_val)
-                    except Exception as e:
-                        print(f"   Failed to set bypass for {inst}: {e}")
-            else:
-                print(f"   (Program {prog} is not a known piano instance, ignoring switch)")
+    worker = threading.Thread(target=pc_worker, args=(bypass_plan, bypass_state), daemon=True)
+    worker.start()
 
-    except KeyboardInterrupt:
+    try:
+        # Sleeps until a signal (or the worker exiting) sets stop_event;
+        # no periodic wakeups while idle
+        stop_event.wait()
         print("\nStopping...")
     finally:
+        request_stop()  # wake the worker so it sees stop_event
+        worker.join(timeout=2.0)
         try:
             client.deactivate()
         except:
@@ -8,15 +8,16 @@ PROGRAM = 14          # 0–127  (14 = P015)
 CHANNEL = 1           # Human MIDI channel (1–16)
 # ==================
 
+# Built once, not on the audio thread
+PC_MSG = bytes([0xC0 | (CHANNEL - 1), PROGRAM])
+
 client = jack.Client("PC_Sender")
 outport = client.midi_outports.register("out")
 
 @client.set_process_callback
 def process(frames):
     # Send exactly ONE Program Change, then disconnect
-    status = 0xC0 | (CHANNEL - 1)
-    event = bytes([status, PROGRAM])
-    outport.write_midi_event(0, event)
+    outport.write_midi_event(0, PC_MSG)
 
     # Stop JACK callback after sending
     client.deactivate()
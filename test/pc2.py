@@ -7,20 +7,19 @@ TARGET_PORT = "system:midi_playback_1"
 PROGRAM = 14   # 0-127
 CHANNEL = 2    # 1-16
 
-done = threading.Event()
-sent = False
+# Built once, not on the audio thread
+PC_MSG = bytes([0xC0 | (CHANNEL - 1), PROGRAM])
+
+done = threading.Event()  # set once the Program Change has been written
 
 client = jack.Client("PC_Sender")
 outport = client.midi_outports.register("out")
 
 @client.set_process_callback
 def process(frames):
-    global sent
-    if sent:
+    if done.is_set():
         return
-    status = 0xC0 | (CHANNEL - 1)
-    outport.write_midi_event(0, bytes([status, PROGRAM]))
-    sent = True
+    outport.write_midi_event(0, PC_MSG)
     done.set()
 
 # Activate
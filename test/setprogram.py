@@ -6,6 +6,9 @@ import sys
 PROGRAM = 14          # MIDI program number (0–127). 14 = P015
 COMMON_CHANNEL = 1    # SL88 Common Channel (human 1–16)
 
+# Program Change status byte on the common channel
+STATUS_PC_COMMON = 0xC0 | (COMMON_CHANNEL - 1)
+
 def open_sl_ctrl_out():
     """
     Find and open the SL CTRL ALSA MIDI output port.
@@ -18,17 +21,21 @@ def open_sl_ctrl_out():
     if not ports:
         raise RuntimeError("No ALSA MIDI OUT ports found.")
 
+    # One pass: an "SL CTRL" port wins, else the first "SL*" port
+    fallback = None
     for idx, name in enumerate(ports):
         if "SL CTRL" in name:
             midiout.open_port(idx)
-            log(f"[sfizz-router] Opened MIDI OUT: {name} (index {idx})")
+            print(f"[sfizz-router] Opened MIDI OUT: {name} (index {idx})")
             return midiout, name
+        if fallback is None and "SL" in name:
+            fallback = idx
 
-    for idx, name in enumerate(ports):
-        if "SL" in name:
-            midiout.open_port(idx)
-            log(f"[sfizz-router] Opened MIDI OUT (fallback): {name} (index {idx})")
-            return midiout, name
+    if fallback is not None:
+        name = ports[fallback]
+        midiout.open_port(fallback)
+        print(f"[sfizz-router] Opened MIDI OUT (fallback): {name} (index {fallback})")
+        return midiout, name
 
     raise RuntimeError("Could not find an SL CTRL or SL* MIDI OUT port.")
 
@@ -37,11 +44,8 @@ def force_initial_program(midiout, program: int) -> None:
     Send a Program Change on the COMMON channel to force the SL88
     to the given program (e.g. 10 -> P011).
     """
-    common_midi_channel = COMMON_CHANNEL - 1  # 16 -> 15
-    status = 0xC0 | common_midi_channel       # Program Change on that channel
-    msg = [status, program]
-    midiout.send_message(msg)
-    log(f"[sfizz-router] Forced SL88 to program={program} (P{program+1:03d}) on ch={COMMON_CHANNEL}")
+    midiout.send_message([STATUS_PC_COMMON, program])
+    print(f"[sfizz-router] Forced SL88 to program={program} (P{program+1:03d}) on ch={COMMON_CHANNEL}")
 
 
 def main():